@@ -81,6 +81,17 @@ DATABASES = {
 }
 
 
+# Cache
+# Shared by every worker process (the recommender's ratings version lives here)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
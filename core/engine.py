@@ -1,13 +1,66 @@
-from typing import Dict, List, Tuple, Optional, Callable
+from functools import lru_cache, partial
+from typing import List, Tuple, Optional, Callable, Set, Union
 
+import numpy as np
+
+from .ratings_matrix import RatingsMatrix
 from .similarity import (
     RatingsDict,
-    cosine_similarity,
-    jaccard_similarity,
+    cosine_similarities,
+    cosine_similarity_rows,
+    jaccard_similarities,
+    jaccard_similarity_bits,
 )
 
 
-SimilarityFunc = Callable[[RatingsDict, str, str], float]
+# (ratings, target row) -> similarity to every user, aligned with user_ids
+SimilarityFunc = Callable[[RatingsMatrix, int], np.ndarray]
+
+
+def _top_k(values: np.ndarray, k: Optional[int]) -> np.ndarray:
+    """
+    Positions of the k largest values, largest first (all of them if k is None).
+
+    Selection is O(n) via np.partition; only the k picked get sorted. Ties
+    go to the earlier position, like a stable sort would.
+    """
+    if k is None or k >= values.size:
+        top = np.arange(values.size)
+    elif k <= 0:
+        top = np.arange(0)
+    else:
+        kth = np.partition(values, values.size - k)[values.size - k]
+        above = np.flatnonzero(values > kth)
+        ties = np.flatnonzero(values == kth)[: k - above.size]
+        top = np.concatenate([above, ties])
+
+    return top[np.argsort(-values[top], kind="stable")]
+
+
+def _cosine_to_all(r: RatingsMatrix, row: int) -> np.ndarray:
+    return cosine_similarities(r.matrix, row, by_item=r.by_item)
+
+
+def _jaccard_to_all(r: RatingsMatrix, row: int, threshold: float = 0.0) -> np.ndarray:
+    # only users who rated one of the target's liked items can overlap
+    items, values = r.row(row)
+    co_raters = np.unique(r.by_item[:, items[values > threshold]].indices)
+    return jaccard_similarities(r.like_bits(threshold), row, candidates=co_raters)
+
+
+@lru_cache(maxsize=8)
+def _similarity_function(metric: str, jaccard_threshold: float = 0.0) -> SimilarityFunc:
+    """
+    Module-level similarity function for (metric, threshold), built once and
+    shared by every engine (so no new partial per recommendation call).
+    """
+    if metric == "cosine":
+        return _cosine_to_all
+
+    if metric == "jaccard":
+        return partial(_jaccard_to_all, threshold=jaccard_threshold)
+
+    raise ValueError(f"Unknown similarity metric: {metric}")
 
 
 class RecommenderEngine:
@@ -16,10 +69,29 @@ class RecommenderEngine:
 
     - Supports 'cosine' and 'jaccard' similarity.
     - Can limit to top-k neighbours.
+    - Accepts a RatingsMatrix, or a ratings dict which is converted once.
     """
 
-    def __init__(self, ratings: RatingsDict) -> None:
+    def __init__(self, ratings: Union[RatingsMatrix, RatingsDict]) -> None:
+        if not isinstance(ratings, RatingsMatrix):
+            ratings = RatingsMatrix.from_dict(ratings)
+
         self.ratings = ratings
+        self.matrix = ratings.matrix
+        self.user_ids = ratings.user_ids
+        self.item_ids = ratings.item_ids
+        self.user_index = ratings.user_index
+        self.item_index = ratings.item_index
+
+    def fit(self, jaccard_threshold: float = 0.0) -> "RecommenderEngine":
+        """
+        Precompute the per-matrix data both metrics need, so a long-lived
+        (e.g. cached) engine only does per-target work on each call.
+        """
+        # both are cached on the ratings matrix after the first access
+        _ = self.ratings.by_item
+        self.ratings.like_bits(jaccard_threshold)
+        return self
 
     # --- internal helpers ---
 
@@ -28,45 +100,24 @@ class RecommenderEngine:
         metric: str,
         jaccard_threshold: float = 0.0,
     ) -> SimilarityFunc:
-        metric = metric.lower()
-
-        if metric == "cosine":
-            return cosine_similarity
-
-        if metric == "jaccard":
-
-            def sim(r: RatingsDict, u1: str, u2: str) -> float:
-                return jaccard_similarity(r, u1, u2, threshold=jaccard_threshold)
-
-            return sim
-
-        raise ValueError(f"Unknown similarity metric: {metric}")
+        return _similarity_function(metric.lower(), jaccard_threshold)
 
-    def _compute_similarities(
+    def _similarity_vector(
         self,
-        target_user: str,
+        target_idx: int,
         metric: str,
         jaccard_threshold: float = 0.0,
-    ) -> Dict[str, float]:
+    ) -> np.ndarray:
         """
-        Similarity between target_user and every other user.
+        Similarity between the target row and every user (aligned with
+        user_ids), with the target's own entry zeroed.
         """
-        if target_user not in self.ratings:
-            # target has no history
-            return {}
-
         sim_func = self._get_similarity_function(metric, jaccard_threshold)
-        similarities: Dict[str, float] = {}
-
-        for other in self.ratings:
-            if other == target_user:
-                continue
 
-            s = sim_func(self.ratings, target_user, other)
-            if s > 0:
-                similarities[other] = s
-
-        return similarities
+        # one vectorised pass over all users instead of a pair loop
+        sims = sim_func(self.ratings, target_idx)
+        sims[target_idx] = 0.0
+        return sims
 
     # --- public API ---
 
@@ -77,52 +128,84 @@ class RecommenderEngine:
         k_neighbours: Optional[int] = None,
         max_results: int = 12,
         jaccard_threshold: float = 0.0,
+        exclude_items: Optional[Set[str]] = None,
     ) -> List[Tuple[str, float]]:
         """
         Recommend items (books) for target_user.
 
+        exclude_items: item ids never to score (e.g. already borrowed),
+        on top of the items the target has rated.
+
         Returns: list of (item_id, score) sorted by score desc.
         """
         if target_user not in self.ratings:
             return []
 
-        similarities = self._compute_similarities(
-            target_user=target_user,
-            metric=metric,
-            jaccard_threshold=jaccard_threshold,
-        )
-        if not similarities:
+        target_idx = self.user_index[target_user]
+        sims = self._similarity_vector(target_idx, metric, jaccard_threshold)
+
+        # neighbours = users with positive similarity, top-k of them if asked
+        neighbours = np.flatnonzero(sims > 0)
+        if neighbours.size == 0:
             return []
+        if k_neighbours is not None:
+            neighbours = neighbours[_top_k(sims[neighbours], k_neighbours)]
 
-        # sort users by similarity
-        neighbours = sorted(
-            similarities.items(), key=lambda x: x[1], reverse=True
-        )
+        # neighbour similarities as a per-user weight vector
+        weights = np.zeros(len(self.user_ids))
+        weights[neighbours] = sims[neighbours]
 
-        if k_neighbours is not None:
-            neighbours = neighbours[:k_neighbours]
+        # scores[item] = sum(sim * rating) over neighbours, as one sparse mat-vec
+        scores = self.matrix.T @ weights
+
+        # only items the target hasn't interacted with
+        target_items, target_data = self.ratings.row(target_idx)
+        scores[target_items[target_data != 0]] = 0.0
+        if exclude_items:
+            scores[
+                [
+                    self.item_index[item_id]
+                    for item_id in exclude_items
+                    if item_id in self.item_index
+                ]
+            ] = 0.0
+
+        candidates = np.flatnonzero(scores > 0)
+        ranked = candidates[_top_k(scores[candidates], max_results)]
+        return [(self.item_ids[j], float(scores[j])) for j in ranked]
 
-        target_ratings = self.ratings[target_user]
-        scores: Dict[str, float] = {}
 
-        for neighbour_id, sim in neighbours:
-            neighbour_ratings = self.ratings[neighbour_id]
-            for item_id, rating in neighbour_ratings.items():
-                # only items the target hasn't interacted with
-                if target_ratings.get(item_id, 0) == 0:
-                    scores[item_id] = scores.get(item_id, 0.0) + sim * rating
+    def similarities_to_all(
+        self,
+        target_user: str,
+        metric: str = "cosine",
+        jaccard_threshold: float = 0.0,
+    ) -> np.ndarray:
+        """
+        Similarity between target_user and every user, aligned with user_ids.
 
-        ranked = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-        return ranked[:max_results]
+        The target's own entry is 0; all zeros if the target has no ratings.
+        """
+        if target_user not in self.ratings:
+            return np.zeros(len(self.user_ids))
 
+        return self._similarity_vector(
+            self.user_index[target_user], metric, jaccard_threshold
+        )
 
     def user_similarity(self, user1: str, user2: str, metric: str = "cosine") -> float:
         """
         Wraps calls to the standalone similarity functions.
         """
-        if metric == "cosine":
-            return cosine_similarity(self.ratings, user1, user2)
-        elif metric == "jaccard":
-            return jaccard_similarity(self.ratings, user1, user2)
-        else:
+        if metric not in ("cosine", "jaccard"):
             raise ValueError(f"Unknown similarity metric: {metric}")
+
+        u1 = self.user_index.get(user1)
+        u2 = self.user_index.get(user2)
+        if u1 is None or u2 is None:
+            return 0.0
+
+        if metric == "cosine":
+            return cosine_similarity_rows(self.matrix, u1, u2)
+
+        return jaccard_similarity_bits(self.ratings.like_bits(), u1, u2)
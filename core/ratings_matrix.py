@@ -0,0 +1,146 @@
+from functools import cached_property
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import numpy.typing as npt
+from scipy.sparse import csc_matrix, csr_matrix
+
+from .similarity import RatingsDict, _row, like_bits
+
+
+def _factorize(values: np.ndarray) -> Tuple[List[str], np.ndarray]:
+    """
+    Helper: (distinct values in first-seen order, index of each value in it).
+    """
+    uniques, first_seen, codes = np.unique(
+        values, return_index=True, return_inverse=True
+    )
+    order = np.argsort(first_seen)
+    rank = np.empty_like(order)
+    rank[order] = np.arange(order.size)
+    return uniques[order].tolist(), rank[codes.ravel()]
+
+
+class RatingsMatrix:
+    """
+    Ratings stored as a users x items CSR matrix.
+
+    - matrix.indptr / matrix.indices / matrix.data hold every rating
+      contiguously, row by row (one row per user).
+    - user_ids / item_ids map rows / columns back to the original ids.
+    - data can be stored compactly (e.g. int8 for 1-5 star ratings);
+      similarity code widens it when accumulating.
+
+    Dicts are only used at the edge, for ingestion (from_dict).
+    """
+
+    def __init__(
+        self,
+        matrix: csr_matrix,
+        user_ids: List[str],
+        item_ids: List[str],
+    ) -> None:
+        matrix.sort_indices()
+        self.matrix = matrix
+        self.user_ids = user_ids
+        self.item_ids = item_ids
+        self.user_index: Dict[str, int] = {u: i for i, u in enumerate(user_ids)}
+        self.item_index: Dict[str, int] = {b: j for j, b in enumerate(item_ids)}
+
+        # packed "liked" bitsets, one per jaccard threshold
+        self._like_bits: Dict[float, np.ndarray] = {}
+
+    # --- construction ---
+
+    @classmethod
+    def from_arrays(
+        cls,
+        users: np.ndarray,
+        items: np.ndarray,
+        ratings: np.ndarray,
+        dtype: npt.DTypeLike = float,
+    ) -> "RatingsMatrix":
+        """
+        Build from three parallel arrays, one entry per rating.
+
+        Ids are mapped to rows / columns with np.unique, keeping the order
+        in which each id first appears.
+
+        dtype: storage type for the ratings (np.int8 for small integer ratings).
+        """
+        user_ids, rows = _factorize(users)
+        item_ids, cols = _factorize(items)
+        return cls._from_coo(user_ids, item_ids, rows, cols, ratings, dtype)
+
+    @classmethod
+    def from_dict(
+        cls,
+        ratings: RatingsDict,
+        dtype: npt.DTypeLike = float,
+    ) -> "RatingsMatrix":
+        """
+        Build from the ratings[user_id][item_id] dict layout.
+
+        Users with an empty ratings dict keep their (empty) row.
+        """
+        item_index: Dict[str, int] = {}
+        rows: List[int] = []
+        cols: List[int] = []
+        data: List[float] = []
+
+        for u, user_r in enumerate(ratings.values()):
+            for item_id, rating in user_r.items():
+                rows.append(u)
+                cols.append(item_index.setdefault(item_id, len(item_index)))
+                data.append(rating)
+
+        return cls._from_coo(list(ratings), list(item_index), rows, cols, data, dtype)
+
+    @classmethod
+    def _from_coo(
+        cls,
+        user_ids: List[str],
+        item_ids: List[str],
+        rows: Sequence[int],
+        cols: Sequence[int],
+        data: Sequence[float],
+        dtype: npt.DTypeLike,
+    ) -> "RatingsMatrix":
+        matrix = csr_matrix(
+            (np.asarray(data, dtype=dtype), (rows, cols)),
+            shape=(len(user_ids), len(item_ids)),
+        )
+        return cls(matrix, user_ids, item_ids)
+
+    # --- lookups ---
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self.user_index
+
+    @property
+    def num_ratings(self) -> int:
+        return self.matrix.nnz
+
+    def row(self, u: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (item indices, ratings) for row u, as views into the CSR arrays.
+        """
+        return _row(self.matrix, u)
+
+    @cached_property
+    def by_item(self) -> csc_matrix:
+        """
+        Item-major (CSC) copy of the matrix: an inverted index item -> users.
+        """
+        return self.matrix.tocsc()
+
+    def like_bits(self, threshold: float = 0.0) -> np.ndarray:
+        """
+        Bitset rows of liked items (see similarity.like_bits), built once per threshold.
+        """
+        if threshold not in self._like_bits:
+            self._like_bits[threshold] = like_bits(self.matrix, threshold)
+        return self._like_bits[threshold]
@@ -1,9 +1,15 @@
 import math
-from typing import Dict
+from typing import Dict, Optional
+
+import numpy as np
+from scipy.sparse import csc_matrix, csr_matrix, spmatrix
 
 # ratings[user_id][item_id] = numeric rating
 RatingsDict = Dict[str, Dict[str, float]]
 
+# set bits per byte value, for NumPy builds without np.bitwise_count (< 2.0)
+_BYTE_POPCOUNT = np.array([bin(b).count("1") for b in range(256)], dtype=np.uint8)
+
 
 def cosine_similarity(ratings: RatingsDict, user1: str, user2: str) -> float:
     """
@@ -14,18 +20,113 @@ def cosine_similarity(ratings: RatingsDict, user1: str, user2: str) -> float:
     items1 = ratings.get(user1, {})
     items2 = ratings.get(user2, {})
 
-    common_items = set(items1.keys()) & set(items2.keys())
-    if not common_items:
+    # one pass over the smaller dict, probing the larger one
+    small, large = (items1, items2) if len(items1) <= len(items2) else (items2, items1)
+    dot = sq_small = sq_large = 0.0
+
+    for item_id, v_small in small.items():
+        v_large = large.get(item_id)
+        if v_large is not None:
+            dot += v_small * v_large
+            sq_small += v_small * v_small
+            sq_large += v_large * v_large
+
+    if sq_small == 0 or sq_large == 0:
+        return 0.0
+
+    return dot / (math.sqrt(sq_small) * math.sqrt(sq_large))
+
+
+def _row(matrix: csr_matrix, u: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Helper: (item indices, ratings) of row u, sliced straight from the CSR arrays.
+    """
+    start, end = matrix.indptr[u], matrix.indptr[u + 1]
+    return matrix.indices[start:end], matrix.data[start:end]
+
+
+def cosine_similarity_rows(matrix: csr_matrix, u1: int, u2: int) -> float:
+    """
+    cosine_similarity for two rows of a CSR ratings matrix.
+
+    Rows must have sorted indices (RatingsMatrix guarantees this).
+    """
+    idx1, data1 = _row(matrix, u1)
+    idx2, data2 = _row(matrix, u2)
+
+    _, pos1, pos2 = np.intersect1d(
+        idx1, idx2, assume_unique=True, return_indices=True
+    )
+    if pos1.size == 0:
         return 0.0
 
-    dot = sum(items1[i] * items2[i] for i in common_items)
-    mag1 = math.sqrt(sum(items1[i] ** 2 for i in common_items))
-    mag2 = math.sqrt(sum(items2[i] ** 2 for i in common_items))
+    v1 = data1[pos1].astype(float)
+    v2 = data2[pos2].astype(float)
+    mag1 = math.sqrt(float(v1 @ v1))
+    mag2 = math.sqrt(float(v2 @ v2))
 
     if mag1 == 0 or mag2 == 0:
         return 0.0
 
-    return dot / (mag1 * mag2)
+    return float(v1 @ v2) / (mag1 * mag2)
+
+
+def cosine_similarities(
+    matrix: csr_matrix,
+    row: int,
+    by_item: Optional[csc_matrix] = None,
+) -> np.ndarray:
+    """
+    Cosine similarity between one user (a matrix row) and every user.
+
+    Same definition as cosine_similarity (common items only), but done
+    with sparse products instead of one Python call per user pair. Only
+    users sharing an item with the target are touched: the target's item
+    columns are sliced out of by_item, the item-major (CSC) copy of the
+    matrix, which works as an inverted index item -> users. With S that
+    users x target-items slice and t the target's ratings:
+
+      dot  = S · t
+      mag1 = P(S) · t²   (target's magnitude over the items each user shares)
+      mag2 = rowsum(S²)  (each user's magnitude over the items the target has)
+
+    Integer ratings (e.g. int8) are accumulated in int32; only the square
+    roots and the final division happen in float.
+    """
+    if by_item is None:
+        by_item = matrix.tocsc()
+
+    acc_dtype = _accumulator_dtype(matrix.dtype)
+    items, values = _row(matrix, row)
+    shared = by_item[:, items].astype(acc_dtype)
+    target = values.astype(acc_dtype)
+
+    dot = shared @ target
+    mag1 = rating_pattern(shared) @ (target * target)
+    mag2 = np.asarray(shared.multiply(shared).sum(axis=1)).ravel()
+
+    # sqrt of each magnitude separately, exactly as cosine_similarity does,
+    # so ties between users break the same way
+    denom = np.sqrt(mag1.astype(float)) * np.sqrt(mag2.astype(float))
+    sims = np.zeros(matrix.shape[0])
+    np.divide(dot, denom, out=sims, where=denom > 0)
+    return sims
+
+
+def _accumulator_dtype(dtype: np.dtype) -> np.dtype:
+    """
+    Helper: dtype to sum products in (int32 for small ints, float stays float).
+    """
+    return np.result_type(dtype, np.int32)
+
+
+def rating_pattern(matrix: spmatrix) -> spmatrix:
+    """
+    0/1 matrix with a 1 wherever the user has a rating entry.
+    """
+    pattern = matrix.copy()
+    pattern.data = np.ones_like(pattern.data, dtype=np.int8)
+    return pattern
 
 
 def _liked_items(
@@ -60,10 +161,84 @@ def jaccard_similarity(
     if not set1 and not set2:
         return 0.0
 
-    inter = len(set1 & set2)
-    union = len(set1 | set2)
+    if len(set1) > len(set2):
+        set1, set2 = set2, set1
+
+    # |A ∪ B| = |A| + |B| - |A ∩ B|, no union set needed
+    inter = sum(1 for item_id in set1 if item_id in set2)
+    union = len(set1) + len(set2) - inter
+
+    return inter / union
+
+
+def like_bits(matrix: csr_matrix, threshold: float = 0.0) -> np.ndarray:
+    """
+    Pack each user's liked items (rating > threshold) into a bitset row.
+
+    Returns a (users, ceil(items / 64)) uint64 array; bit j of a row is
+    set when the user likes item j.
+    """
+    n_users, n_items = matrix.shape
+    bits = np.zeros((n_users, (n_items + 63) // 64), dtype=np.uint64)
+
+    liked = matrix.data > threshold
+    rows = np.repeat(np.arange(n_users), np.diff(matrix.indptr))[liked]
+    cols = matrix.indices[liked].astype(np.uint64)
+
+    np.bitwise_or.at(
+        bits,
+        (rows, (cols >> np.uint64(6)).astype(np.intp)),
+        np.uint64(1) << (cols & np.uint64(63)),
+    )
+    return bits
+
+
+def _popcount(words: np.ndarray) -> np.ndarray:
+    """
+    Helper: number of set bits in each row of a 2-D uint64 array.
+    """
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=1, dtype=np.int64)
+
+    as_bytes = np.ascontiguousarray(words).view(np.uint8)
+    return _BYTE_POPCOUNT[as_bytes].sum(axis=1, dtype=np.int64)
+
+
+def jaccard_similarities(
+    bits: np.ndarray,
+    row: int,
+    candidates: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """
+    Jaccard similarity between one user and every user, from like_bits().
+
+    |A ∩ B| and |A ∪ B| are popcounts of the AND / OR of the bitset rows,
+    so each user pair costs ceil(items / 64) word operations. If
+    candidates (row indices) is given, only those users are scored and
+    everyone else gets 0 -- pass the users sharing a liked item.
+    """
+    if candidates is None:
+        candidates = np.arange(bits.shape[0])
 
+    target = bits[row]
+    rows = bits[candidates]
+    inter = _popcount(rows & target)
+    union = _popcount(rows | target)
+
+    scored = np.zeros(candidates.size)
+    np.divide(inter, union, out=scored, where=union > 0)
+
+    sims = np.zeros(bits.shape[0])
+    sims[candidates] = scored
+    return sims
+
+
+def jaccard_similarity_bits(bits: np.ndarray, u1: int, u2: int) -> float:
+    """
+    jaccard_similarity for two users' like_bits() rows (popcount of AND / OR).
+    """
+    inter, union = _popcount(np.vstack([bits[u1] & bits[u2], bits[u1] | bits[u2]]))
     if union == 0:
         return 0.0
 
-    return inter / union
+    return int(inter) / int(union)
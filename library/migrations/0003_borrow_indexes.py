@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-15 09:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0002_alter_borrow_rating'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(fields=['user', 'active', 'book'], name='borrow_user_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='borrow',
+            index=models.Index(condition=models.Q(('rating__gt', 0)), fields=['rating'], name='borrow_rating_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-15 09:56
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0004_book_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='borrow',
+            name='rating',
+            field=models.PositiveSmallIntegerField(default=0, validators=[django.core.validators.MaxValueValidator(5)]),
+        ),
+    ]
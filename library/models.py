@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.core.validators import MaxValueValidator
 from django.db import models
 
 
@@ -22,6 +23,16 @@ class Book(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # home: newest books first, optionally within one genre
+            models.Index(
+                fields=["genre", "-created_at"],
+                name="book_genre_created_idx",
+            ),
+            models.Index(fields=["-created_at"], name="book_created_idx"),
+        ]
+
     def __str__(self):
         return self.title
 
@@ -33,13 +44,29 @@ class Borrow(models.Model):
     """
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
-    rating = models.PositiveSmallIntegerField(default=0)
+    # 0 = not rated yet, otherwise 1-5 stars
+    rating = models.PositiveSmallIntegerField(
+        default=0, validators=[MaxValueValidator(5)]
+    )
     active = models.BooleanField(default=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         unique_together = ("user", "book")
+        indexes = [
+            # per-user history / currently-borrowed lookups (index-only scans)
+            models.Index(
+                fields=["user", "active", "book"],
+                name="borrow_user_active_idx",
+            ),
+            # build_ratings() only ever reads rated rows
+            models.Index(
+                fields=["rating"],
+                name="borrow_rating_idx",
+                condition=models.Q(rating__gt=0),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user} → {self.book} ({self.rating})"
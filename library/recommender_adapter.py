@@ -1,22 +1,97 @@
-from typing import Dict, List
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
 
 from .models import Borrow, Book
 from core.engine import RecommenderEngine
+from core.ratings_matrix import RatingsMatrix
+
+
+def build_ratings() -> RatingsMatrix:
+    # (user pk, book pk, rating) rows streamed straight into integer columns;
+    # out-of-range ratings (e.g. from a bulk .update()) are skipped, not stored
+    rows = (
+        Borrow.objects.filter(rating__gt=0, rating__lte=5)
+        .values_list("user_id", "book_id", "rating")
+        .iterator(chunk_size=5000)
+    )
+    cols = np.fromiter(
+        rows, dtype=[("user", np.int64), ("book", np.int64), ("rating", np.int8)]
+    )
+
+    # Rows / columns are keyed by username and str(book id) for the engine;
+    # one lookup per distinct user. Rows of a user deleted mid-build are
+    # dropped (their delete already triggers another rebuild).
+    user_pks = np.unique(cols["user"])
+    users = get_user_model().objects.only("username").in_bulk(user_pks.tolist())
+    if len(users) < user_pks.size:
+        cols = cols[np.isin(cols["user"], list(users))]
+
+    # ratings are 1-5 stars, so int8 is plenty
+    by_pk = RatingsMatrix.from_arrays(
+        cols["user"], cols["book"], cols["rating"], dtype=np.int8
+    )
+    return RatingsMatrix(
+        by_pk.matrix,
+        [users[pk].username for pk in by_pk.user_ids],
+        [str(pk) for pk in by_pk.item_ids],
+    )
 
 
-def build_ratings() -> Dict[str, Dict[str, float]]:
-    ratings: Dict[str, Dict[str, float]] = {}
+ENGINE_VERSION_KEY = "recommender_engine:version"
 
-    for borrow in Borrow.objects.filter(rating__gt=0):
-        user = borrow.user.username
-        book = str(borrow.book_id)
-        rating = float(borrow.rating)
+# Upper bound on how long a process trusts its engine without a version bump
+# (e.g. if the cache backend is ever not shared between workers)
+ENGINE_MAX_AGE = 15 * 60
 
-        if user not in ratings:
-            ratings[user] = {}
-        ratings[user][book] = rating
+# (ratings version, time.monotonic() when built, fitted engine) for this process
+_engine_memo: Optional[Tuple[Optional[int], float, RecommenderEngine]] = None
 
-    return ratings
+
+def _ratings_version() -> Optional[int]:
+    version = cache.get(ENGINE_VERSION_KEY)
+    if version is None:
+        # new or evicted counter: start from a value no process has built from
+        cache.add(ENGINE_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(ENGINE_VERSION_KEY)
+    return version
+
+
+def get_engine() -> RecommenderEngine:
+    """
+    Fitted engine held in this process's memory, rebuilt when the ratings
+    version in the (shared) cache has moved on (see invalidate_ratings()),
+    or after ENGINE_MAX_AGE seconds at the latest.
+
+    Only the small version counter goes through the cache, so requests never
+    unpickle the engine, and every worker sees a bump. The version is read
+    before building, so a rating committed mid-build triggers another
+    rebuild on the next request.
+    """
+    global _engine_memo
+    version = _ratings_version()
+    memo = _engine_memo
+    if (
+        memo is None
+        or version is None
+        or memo[0] != version
+        or time.monotonic() - memo[1] > ENGINE_MAX_AGE
+    ):
+        memo = (version, time.monotonic(), RecommenderEngine(build_ratings()).fit())
+        _engine_memo = memo
+    return memo[2]
+
+
+def invalidate_ratings() -> None:
+    try:
+        cache.incr(ENGINE_VERSION_KEY)
+        # backends without a native incr re-set the key with the default timeout
+        cache.touch(ENGINE_VERSION_KEY, timeout=None)
+    except ValueError:
+        cache.add(ENGINE_VERSION_KEY, time.time_ns(), timeout=None)
 
 
 def get_recommendations_for_user(
@@ -25,69 +100,58 @@ def get_recommendations_for_user(
     k_neighbours: int | None = None,
     max_results: int = 12,
 ) -> List[dict]:
-    ratings = build_ratings()
+    engine = get_engine()
     user_id = user.username
 
-    if user_id not in ratings:
+    if user_id not in engine.ratings:
         return []
 
-    engine = RecommenderEngine(ratings)
+    # Exclude any book this user has EVER borrowed (active or past)
+    seen_ids = set(
+        map(str, Borrow.objects.filter(user=user).values_list("book_id", flat=True))
+    )
+
     raw_recs = engine.recommend_for_user(
         target_user=user_id,
         metric=metric,
         k_neighbours=k_neighbours,
         max_results=max_results,
+        exclude_items=seen_ids,
     )
 
-    if not raw_recs:
-        return []
-
-    # Exclude any book this user has EVER borrowed (active or past)
-    seen_ids = set(
-        Borrow.objects.filter(user=user).values_list("book_id", flat=True)
-    )
     filtered = []
     for book_id_str, score in raw_recs:
         try:
             book_id_int = int(book_id_str)
         except ValueError:
             continue
-        if book_id_int in seen_ids:
-            continue
         filtered.append((book_id_int, score))
 
     if not filtered:
         return []
 
-    scores = [s for _, s in filtered]
-    max_score = max(scores)
-    min_score = min(scores)
-
-    results: List[dict] = []
-
-    for idx, (book_id, score) in enumerate(filtered):
-        try:
-            book = Book.objects.get(pk=book_id)
-        except Book.DoesNotExist:
-            continue
+    # Scores → match % in one array expression
+    scores = np.fromiter((s for _, s in filtered), dtype=float, count=len(filtered))
+    min_score, max_score = scores.min(), scores.max()
 
+    if max_score > min_score:
         # If scores differ, normalise properly
-        if max_score > min_score:
-            pct = 60.0 + 40.0 * (score - min_score) / (max_score - min_score)
-        else:
-            # All scores equal → spread by rank between 100 and 60
-            n = len(filtered)
-            if n == 1:
-                pct = 100.0
-            else:
-                pct = 100.0 - (idx / (n - 1)) * 40.0
-
-        results.append(
-            {
-                "book": book,
-                "score": score,
-                "match_percent": round(pct, 1),
-            }
-        )
-
-    return results
\ No newline at end of file
+        pcts = 60.0 + 40.0 * (scores - min_score) / (max_score - min_score)
+    else:
+        # All scores equal → spread by rank between 100 and 60
+        pcts = np.linspace(100.0, 60.0, len(filtered))
+
+    # one query for all recommended books (genre is used for grouping)
+    books_by_id = Book.objects.select_related("genre").in_bulk(
+        [book_id for book_id, _ in filtered]
+    )
+
+    return [
+        {
+            "book": books_by_id[book_id],
+            "score": score,
+            "match_percent": pct,
+        }
+        for (book_id, score), pct in zip(filtered, np.round(pcts, 1).tolist())
+        if book_id in books_by_id
+    ]
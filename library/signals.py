@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Borrow
+from .recommender_adapter import invalidate_ratings
+
+
+# Invalidation waits for the writer's transaction to commit: bumping the
+# version earlier would let another request rebuild from pre-commit data
+# and keep that stale engine under the new version.
+
+
+@receiver(post_save, sender=Borrow)
+def borrow_saved(sender, instance, created, update_fields=None, using=None, **kwargs):
+    # unrated new borrows and active-only updates can't change the ratings matrix
+    if created and instance.rating <= 0:
+        return
+    if update_fields is not None and set(update_fields) <= {"active"}:
+        return
+    transaction.on_commit(invalidate_ratings, using=using)
+
+
+@receiver(post_delete, sender=Borrow)
+def borrow_deleted(sender, instance, using=None, **kwargs):
+    # any other borrow write (views, admin, shell) may change the ratings matrix
+    transaction.on_commit(invalidate_ratings, using=using)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, update_fields=None, using=None, **kwargs):
+    # the matrix is keyed by username; new users and e.g. last_login updates can't affect it
+    if created:
+        return
+    if update_fields is not None and "username" not in update_fields:
+        return
+    transaction.on_commit(invalidate_ratings, using=using)
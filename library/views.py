@@ -1,16 +1,33 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Exists, Max, OuterRef, Subquery
 from django.shortcuts import get_object_or_404, redirect, render
 
 from .models import Book, Genre, Borrow
 from core.engine import RecommenderEngine
-from .recommender_adapter import get_recommendations_for_user, build_ratings
+from core.ratings_matrix import RatingsMatrix
+from .recommender_adapter import get_recommendations_for_user, get_engine
 
-from collections import defaultdict
+from collections import defaultdict, namedtuple
 import time
-import random
 import math
 
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+# Small fixed-shape rows for templates (attribute access works like dict keys)
+GenreGroup = namedtuple("GenreGroup", "genre items")
+LiveRow = namedtuple("LiveRow", "metric time_ms count")
+RatingsRow = namedtuple("RatingsRow", "user pairs")
+SimilarityRow = namedtuple("SimilarityRow", "user cosine jaccard")
+KRow = namedtuple("KRow", "k time_ms count")
+
+# Books per home page / users per page of the insights ratings table
+PAGE_SIZE = 24
+RATINGS_PAGE_SIZE = 50
 
 
 def home(request):
@@ -25,25 +42,23 @@ def home(request):
         if selected_genre:
             books_qs = books_qs.filter(genre=selected_genre)
 
-    latest_books = list(books_qs)
-
     # Which books has the current user borrowed, and how did they rate them?
+    # Answered per book in the same query instead of a second Borrow scan.
     if request.user.is_authenticated:
-        borrows = Borrow.objects.filter(user=request.user)
-        borrowed_ids = {b.book_id for b in borrows if b.active}
-        user_ratings_dict = {b.book_id: b.rating for b in borrows if b.rating > 0}
-    else:
-        borrowed_ids = set()
-        user_ratings_dict = {}
+        my_borrows = Borrow.objects.filter(user=request.user, book=OuterRef("pk"))
+        books_qs = books_qs.annotate(
+            is_borrowed=Exists(my_borrows.filter(active=True)),
+            user_rating=Subquery(my_borrows.filter(rating__gt=0).values("rating")[:1]),
+        )
 
-    # Attach user_rating to each book object for easy use in templates
-    for book in latest_books:
-        book.user_rating = user_ratings_dict.get(book.id)
+    # Only one page of books is fetched (LIMIT/OFFSET), not the whole catalogue
+    page_obj = Paginator(books_qs, PAGE_SIZE).get_page(request.GET.get("page"))
+    latest_books = list(page_obj)
 
     context = {
         "genres": genres,
         "latest_books": latest_books,
-        "borrowed_ids": borrowed_ids,
+        "page_obj": page_obj,
         "selected_genre": selected_genre,
     }
     return render(request, "library/home.html", context)
@@ -67,7 +82,7 @@ def borrow_book(request, pk):
         else:
             borrow.active = True
             # keep previous rating; they can re-rate if they want
-            borrow.save()
+            borrow.save(update_fields=["active"])
             messages.success(request, f"You borrowed '{book.title}' again.")
 
     return redirect("library:home")
@@ -77,24 +92,25 @@ def borrow_book(request, pk):
 @login_required
 def return_book(request, pk):
     book = get_object_or_404(Book, pk=pk)
-    try:
-        borrow = Borrow.objects.get(user=request.user, book=book)
-    except Borrow.DoesNotExist:
-        messages.warning(request, "You haven't borrowed that book.")
-        return redirect("library:home")
 
-    if not borrow.active:
-        messages.info(request, f"You already returned '{book.title}'.")
-        return redirect("library:home")
+    # Rated and still active → return it in a single UPDATE
+    # (only `active` changes, so the cached ratings stay valid)
+    updated = Borrow.objects.filter(
+        user=request.user, book=book, active=True, rating__gt=0
+    ).update(active=False)
 
-    if borrow.rating <= 0:
-        messages.warning(request, "Please use the rating popup to return a book.")
+    if updated:
+        messages.info(request, f"You returned '{book.title}'.")
         return redirect("library:home")
 
-    # Rated → now allow return
-    borrow.active = False
-    borrow.save()
-    messages.info(request, f"You returned '{book.title}'.")
+    # Nothing returned: look the row up only to explain why
+    borrow = Borrow.objects.filter(user=request.user, book=book).first()
+    if borrow is None:
+        messages.warning(request, "You haven't borrowed that book.")
+    elif not borrow.active:
+        messages.info(request, f"You already returned '{book.title}'.")
+    else:
+        messages.warning(request, "Please use the rating popup to return a book.")
     return redirect("library:home")
 
 
@@ -123,23 +139,18 @@ def recommendations(request):
         grouped[rec["book"].genre].append(rec)
 
     grouped_recs = [
-        {"genre": genre, "items": items}
+        GenreGroup(genre, items)
         for genre, items in grouped.items()
     ]
-    grouped_recs.sort(key=lambda g: g["genre"].name)
-
-    # Borrow-again: distinct books the user has ever borrowed
-    history_qs = (
-        Borrow.objects.filter(user=request.user)
-        .select_related("book", "book__genre")
-        .order_by("-created_at")
+    grouped_recs.sort(key=lambda g: g.genre.name)
+
+    # Borrow-again: distinct books the user has ever borrowed, most recent first
+    history_books = list(
+        Book.objects.filter(borrow__user=request.user)
+        .select_related("genre")
+        .annotate(last_borrow=Max("borrow__created_at"))
+        .order_by("-last_borrow")
     )
-    seen_book_ids = set()
-    history_books = []
-    for b in history_qs:
-        if b.book_id not in seen_book_ids:
-            seen_book_ids.add(b.book_id)
-            history_books.append(b.book)
 
     context = {
         "grouped_recs": grouped_recs,
@@ -177,18 +188,13 @@ def rate_and_return_book(request):
 
     book = get_object_or_404(Book, pk=book_id)
 
-    borrow, created = Borrow.objects.get_or_create(
+    # Set rating, mark as returned (inserts the row if it was never borrowed)
+    Borrow.objects.update_or_create(
         user=request.user,
         book=book,
         defaults={"rating": rating_int, "active": False},
     )
 
-    if not created:
-        # Update rating, mark as returned
-        borrow.rating = rating_int
-        borrow.active = False
-        borrow.save()
-
     messages.success(
         request,
         f"You rated '{book.title}' {rating_int}/5 and returned it.",
@@ -197,39 +203,17 @@ def rate_and_return_book(request):
 
 
 
-@login_required
-def algorithm_insights(request):
-    # 1) Build current ratings matrix from DB
-    ratings = build_ratings()
-    num_users = len(ratings)
-    all_book_ids = {book_id for user_r in ratings.values() for book_id in user_r.keys()}
-    num_books = len(all_book_ids)
-    num_ratings = sum(len(user_r) for user_r in ratings.values())
+BENCH_CACHE_KEY = "algo_insights:bench:v2"
+BENCH_CACHE_SECONDS = 60 * 60
 
-    # 2) Live performance for this user: cosine vs jaccard
-    metrics = ["cosine", "jaccard"]
-    live_results = []
 
-    if request.user.username in ratings:
-        engine = RecommenderEngine(ratings)
-        for metric_name in metrics:
-            start = time.perf_counter()
-            recs = engine.recommend_for_user(
-                target_user=request.user.username,
-                metric=metric_name,
-                k_neighbours=None,
-                max_results=20,
-            )
-            elapsed_ms = (time.perf_counter() - start) * 1000.0
-            live_results.append(
-                {
-                    "metric": metric_name,
-                    "time_ms": elapsed_ms,
-                    "count": len(recs),
-                }
-            )
+def _synthetic_benchmark():
+    """
+    Time recommend_for_user() for user U0 with cosine and jaccard on random
+    rating matrices of growing size.
 
-    # 3) Synthetic benchmark: compare cosine vs jaccard on the same random matrices
+    Returns (labels, cosine_ms, jaccard_ms) lists for the insights charts.
+    """
     bench_sizes = [
         (10, 20),
         (20, 50),
@@ -239,18 +223,17 @@ def algorithm_insights(request):
     bench_cosine = []
     bench_jaccard = []
 
-    rng = random.Random(42)
+    rng = np.random.default_rng(42)
 
     for u_count, b_count in bench_sizes:
-        # Build random rating matrix
-        synth_ratings = {}
-        for i in range(u_count):
-            user_id = f"U{i}"
-            user_ratings = {}
-            for j in range(b_count):
-                if rng.random() < 0.4:  # 40% chance user rated book j
-                    user_ratings[str(j)] = rng.randint(1, 5)
-            synth_ratings[user_id] = user_ratings
+        # Build random rating matrix straight into CSR (40% chance user rated book j)
+        rated = rng.random((u_count, b_count)) < 0.4
+        stars = rng.integers(1, 6, size=(u_count, b_count))
+        synth_ratings = RatingsMatrix(
+            csr_matrix(np.where(rated, stars, 0).astype(np.int8)),
+            [f"U{i}" for i in range(u_count)],
+            [str(j) for j in range(b_count)],
+        )
 
         engine_synth = RecommenderEngine(synth_ratings)
         target = "U0"
@@ -279,39 +262,72 @@ def algorithm_insights(request):
         bench_cosine.append(cosine_ms)
         bench_jaccard.append(jaccard_ms)
 
-    # 4) Flatten ratings dict for nice display
-    ratings_users = sorted(ratings.keys())
+    return bench_labels, bench_cosine, bench_jaccard
+
+
+@login_required
+def algorithm_insights(request):
+    # 1) Current ratings matrix; one cached, fitted engine serves every
+    #    section below (rebuilt from DB only after rating changes)
+    engine = get_engine()
+    ratings = engine.ratings
+    num_users = len(ratings)
+    num_books = len(ratings.item_ids)
+    num_ratings = ratings.num_ratings
+
+    # 2) Live performance for this user: cosine vs jaccard
+    metrics = ["cosine", "jaccard"]
+    live_results = []
+
+    if request.user.username in ratings:
+        for metric_name in metrics:
+            start = time.perf_counter()
+            recs = engine.recommend_for_user(
+                target_user=request.user.username,
+                metric=metric_name,
+                k_neighbours=None,
+                max_results=20,
+            )
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            live_results.append(LiveRow(metric_name, elapsed_ms, len(recs)))
+
+    # 3) Synthetic benchmark: compare cosine vs jaccard on the same random matrices
+    #    (independent of the live data, so computed at most once an hour)
+    bench_labels, bench_cosine, bench_jaccard = cache.get_or_set(
+        BENCH_CACHE_KEY, _synthetic_benchmark, BENCH_CACHE_SECONDS
+    )
+
+    # 4) Flatten ratings matrix for nice display, one CSR row per user
+    #    (only the users on the requested page of the table)
+    ratings_users = sorted(ratings.user_ids)
+    ratings_page = Paginator(ratings_users, RATINGS_PAGE_SIZE).get_page(
+        request.GET.get("ratings_page")
+    )
+    item_ids = np.array(ratings.item_ids)
     ratings_rows = []
-    for u in ratings_users:
-        user_r = ratings.get(u, {})
-        pairs = sorted(user_r.items(), key=lambda x: x[0])
-        ratings_rows.append(
-            {
-                "user": u,
-                "pairs": pairs,
-            }
-        )
+    for u in ratings_page:
+        items, data = ratings.row(ratings.user_index[u])
+        ids = item_ids[items]
+        order = np.argsort(ids)
+        pairs = list(zip(ids[order].tolist(), data[order].astype(float).tolist()))
+        ratings_rows.append(RatingsRow(u, pairs))
 
     # 5) Raw similarity numbers: current user vs others
     similarity_rows = []
     if request.user.username in ratings and len(ratings_users) > 1:
-        engine_full = RecommenderEngine(ratings)
         target = request.user.username
 
-        for other in ratings_users:
-            if other == target:
-                continue
-            cos_val = engine_full.user_similarity(target, other, metric="cosine")
-            jac_val = engine_full.user_similarity(target, other, metric="jaccard")
-            similarity_rows.append(
-                {
-                    "user": other,
-                    "cosine": cos_val,
-                    "jaccard": jac_val,
-                }
-            )
+        # one vectorised call per metric instead of a call per user pair
+        cos_vec = engine.similarities_to_all(target, metric="cosine")
+        jac_vec = engine.similarities_to_all(target, metric="jaccard")
 
-        similarity_rows.sort(key=lambda r: r["cosine"], reverse=True)
+        # highest cosine first, ties by username
+        order = np.lexsort((np.array(engine.user_ids), -cos_vec))
+        similarity_rows = [
+            SimilarityRow(engine.user_ids[i], float(cos_vec[i]), float(jac_vec[i]))
+            for i in order
+            if engine.user_ids[i] != target
+        ]
 
     # 6) k-neighbour sweep for THIS user (cosine only)
     k_labels = []
@@ -320,12 +336,11 @@ def algorithm_insights(request):
     k_rows = []
 
     if request.user.username in ratings:
-        engine_k = RecommenderEngine(ratings)
         k_values = [1, 2, 3, 5, 10, None]
         for k in k_values:
             label = "all" if k is None else str(k)
             start = time.perf_counter()
-            recs = engine_k.recommend_for_user(
+            recs = engine.recommend_for_user(
                 target_user=request.user.username,
                 metric="cosine",
                 k_neighbours=k,
@@ -338,13 +353,7 @@ def algorithm_insights(request):
 
         # Build rows for template table
         for label, t, c in zip(k_labels, k_times, k_counts):
-            k_rows.append(
-                {
-                    "k": label,
-                    "time_ms": t,
-                    "count": c,
-                }
-            )
+            k_rows.append(KRow(label, t, c))
 
     context = {
         "num_users": num_users,
@@ -355,6 +364,7 @@ def algorithm_insights(request):
         "bench_cosine": bench_cosine,
         "bench_jaccard": bench_jaccard,
         "ratings_rows": ratings_rows,
+        "ratings_page": ratings_page,
         "similarity_rows": similarity_rows,
         "k_labels": k_labels,
         "k_times": k_times,